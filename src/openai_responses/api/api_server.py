@@ -1,19 +1,18 @@
+import asyncio
 import datetime
 import logging
 import os
 import uuid
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
-from typing import Callable, Literal, Optional
+from typing import TYPE_CHECKING, Callable, Literal, Optional
 
-from fastapi import FastAPI, Request
-from fastapi.responses import StreamingResponse
-from gpt_oss.tools.python_docker.docker_tool import PythonTool
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from openai_harmony import (
     Author,
     Conversation,
     DeveloperContent,
-    HarmonyEncoding,
     HarmonyEncodingName,
     Message,
     ReasoningEffort,
@@ -47,6 +46,7 @@ from openai_responses.api.events import (
 )
 from openai_responses.api.types import (
     CodeInterpreterCallItem,
+    EncodingProtocol,
     Error,
     FunctionCallItem,
     Item,
@@ -65,6 +65,12 @@ from openai_responses.api.types import (
 )
 from openai_responses.tools.simple_web_search import SimpleWebSearchTool
 
+if TYPE_CHECKING:
+    # gpt_oss pulls in docker tooling; only import it for type checking and
+    # defer the runtime import until a request actually enables the code
+    # interpreter.
+    from gpt_oss.tools.python_docker.docker_tool import PythonTool
+
 DEFAULT_TEMPERATURE = 1.0
 STATE_PATH = Path.home().joinpath(".local/state/openai-responses")
 STATE_PATH.mkdir(parents=True, exist_ok=True)
@@ -95,11 +101,12 @@ def is_not_builtin_tool(recipient: str) -> bool:
 def create_api_server(
     model_connection: Optional[ModelConnection] = None,
     inference_backend: Optional[str] = None,
-    encoding: Optional[HarmonyEncoding] = None,
+    encoding: Optional[EncodingProtocol] = None,
     encoding_name: str = "HarmonyGptOss",
     checkpoint: str = "gpt-oss:20b",
     log_level: int = logging.DEBUG,
     verbosity: int = logging.WARNING,
+    web_search_tool_cls: type[SimpleWebSearchTool] = SimpleWebSearchTool,
 ) -> FastAPI:
     # TODO: Make this into a proper config setup using configparser
     if model_connection is None:
@@ -145,7 +152,31 @@ def create_api_server(
     stream_handler.setLevel(int(os.getenv("OPENAI_RESPONSES_VERBOSITY", verbosity)))
     logger.addHandler(stream_handler)
 
-    app = FastAPI()
+    # orjson serializes the response payloads several times faster than the
+    # stdlib json path behind the default JSONResponse.
+    app = FastAPI(default_response_class=ORJSONResponse)
+
+    def set_web_tool_cls(cls: type[SimpleWebSearchTool]) -> None:
+        nonlocal web_search_tool_cls
+        web_search_tool_cls = cls
+        app.state.web_search_tool_cls = cls
+
+    def set_encoding(new_encoding: EncodingProtocol) -> None:
+        nonlocal encoding
+        encoding = new_encoding
+        app.state.encoding = new_encoding
+
+    # The handler and the nested generate_response/StreamResponsesEvents all
+    # read these closure variables directly, so nothing walks
+    # request.app.state per request; tests substitute stubs through the
+    # set_* hooks instead of patching module globals or rebuilding the app.
+    # (FastAPI dependency_overrides would only reach the route handler, not
+    # the nested closures and background generators, so the hooks rebind the
+    # shared closure cells instead.)
+    app.state.web_search_tool_cls = web_search_tool_cls
+    app.state.set_web_tool_cls = set_web_tool_cls
+    app.state.encoding = encoding
+    app.state.set_encoding = set_encoding
     responses_store: dict[str, tuple[ResponsesRequest, ResponseObject]] = {}
 
     def generate_response(
@@ -158,7 +189,7 @@ def create_api_server(
         previous_response_id: Optional[str] = None,
         web_search_tool: Optional[SimpleWebSearchTool] = None,
         web_search_call_ids: Optional[list[str]] = None,
-        python_tool: Optional[PythonTool] = None,
+        python_tool: Optional["PythonTool"] = None,
         python_call_ids: Optional[list[str]] = None,
     ) -> ResponseObject:
         output = []
@@ -204,7 +235,7 @@ def create_api_server(
                         )
                     fc_index += 1
                     output.append(
-                        FunctionCallItem(
+                        FunctionCallItem.model_construct(
                             type="function_call",
                             name=name,
                             arguments=arguments,
@@ -264,7 +295,7 @@ def create_api_server(
                             web_search_call_id = f"ws_{uuid.uuid4().hex}"
                         web_search_tool_index += 1
                         output.append(
-                            WebSearchCallItem(
+                            WebSearchCallItem.model_construct(
                                 type="web_search_call",
                                 id=web_search_call_id,
                                 action=action,
@@ -281,7 +312,7 @@ def create_api_server(
                         code_call_id = f"ci_{uuid.uuid4().hex}"
                     python_tool_index += 1
                     output.append(
-                        CodeInterpreterCallItem(
+                        CodeInterpreterCallItem.model_construct(
                             type="code_interpreter_call",
                             id=code_call_id,
                         )
@@ -295,13 +326,16 @@ def create_api_server(
                                     content_entry["text"]
                                 )
                             )
-                            annotations = [UrlCitation(**a) for a in annotation_entries]
+                            annotations = [
+                                UrlCitation.model_construct(**a)
+                                for a in annotation_entries
+                            ]
                         else:
                             text_content = content_entry["text"]
                             annotations = []
 
                         content.append(
-                            TextContentItem(
+                            TextContentItem.model_construct(
                                 type="output_text",
                                 text=text_content,
                                 annotations=annotations,
@@ -309,7 +343,7 @@ def create_api_server(
                         )
 
                     output.append(
-                        Item(
+                        Item.model_construct(
                             type="message",
                             role="assistant",
                             content=content,
@@ -319,14 +353,14 @@ def create_api_server(
                 elif entry_dict["channel"] == "analysis":
                     summary = []
                     content = [
-                        ReasoningTextContentItem(
+                        ReasoningTextContentItem.model_construct(
                             type="reasoning_text",
                             text=entry["text"],
                         )
                         for entry in entry_dict["content"]
                     ]
                     output.append(
-                        ReasoningItem(
+                        ReasoningItem.model_construct(
                             type="reasoning",
                             summary=summary,
                             content=content,
@@ -336,7 +370,7 @@ def create_api_server(
             output = []
 
         usage = (
-            Usage(
+            Usage.model_construct(
                 input_tokens=len(input_tokens),
                 output_tokens=len(output_tokens),
                 total_tokens=len(input_tokens) + len(output_tokens),
@@ -368,7 +402,9 @@ def create_api_server(
             else {}
         )
 
-        return ResponseObject(
+        # Everything above is built by trusted code from already-parsed
+        # tokens; model_construct skips validator dispatch on each item.
+        return ResponseObject.model_construct(
             created_at=int(datetime.datetime.now().timestamp()),
             status="completed",
             output=output,
@@ -401,7 +437,7 @@ def create_api_server(
                 Callable[[str, ResponsesRequest, ResponseObject], None]
             ] = None,
             web_search_tool: Optional[SimpleWebSearchTool] = None,
-            python_tool: Optional[PythonTool] = None,
+            python_tool: Optional["PythonTool"] = None,
         ):
             self.initial_tokens = initial_tokens
             self.tokens = initial_tokens.copy()
@@ -494,7 +530,11 @@ def create_api_server(
                         self.request.headers.get("session_id") if self.request else None
                     )
                     break
-                next_tok = model_connection.infer_next_token(
+                # infer_next_token blocks on the backend (condition wait or
+                # HTTP read), so run it in a worker thread to keep the event
+                # loop free for disconnect checks and other requests.
+                next_tok = await asyncio.to_thread(
+                    model_connection.infer_next_token,
                     self.tokens,
                     temperature=self.temperature,
                     new_request=self.new_request,
@@ -975,7 +1015,10 @@ def create_api_server(
                     )
                 )
 
-    @app.post("/v1/responses", response_model=ResponseObject)
+    # response_model is disabled on purpose: the handler serializes the
+    # ResponseObject itself with model_dump_json, skipping FastAPI's
+    # revalidation and jsonable_encoder walk over the finished payload.
+    @app.post("/v1/responses", response_model=None)
     async def generate(body: ResponsesRequest, request: Request):
         logger.info("request received")
         logger.info(
@@ -1037,11 +1080,13 @@ def create_api_server(
                     )
                 case _:
                     raise ValueError("Must specify a valid search backend")
-            web_search_tool = SimpleWebSearchTool(backend=backend)
+            web_search_tool = web_search_tool_cls(backend=backend)
         else:
             web_search_tool = None
 
         if use_code_interpreter:
+            from gpt_oss.tools.python_docker.docker_tool import PythonTool
+
             python_tool = PythonTool()
         else:
             python_tool = None
@@ -1220,6 +1265,9 @@ def create_api_server(
             async for event in event_stream.run():
                 last_event = event
 
-            return last_event.response
+            return Response(
+                content=last_event.response.model_dump_json(),
+                media_type="application/json",
+            )
 
     return app
@@ -4,9 +4,14 @@ for testing and development. It does not leverage any prompt caching or other op
 can therefore be slow between turns.
 """
 
+import os
 import threading
 import time
+from array import array
 from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import wait as futures_wait
+from itertools import islice
 from typing import Optional
 
 import ollama
@@ -15,6 +20,9 @@ from openai_harmony import HarmonyEncodingName, load_harmony_encoding
 from openai_responses.api.types import ModelConnection
 
 EOS_TOKEN = 200002  # only used on hard timeout
+# How many stable tokens the producer accumulates before taking the buffer
+# lock and waking the consumer; chunk.done always forces a flush.
+TOKEN_BATCH = int(os.environ.get("OPENAI_RESPONSES_TOKEN_BATCH", "8"))
 
 
 def _now():
@@ -23,42 +31,111 @@ def _now():
 
 def setup_model(checkpoint: str) -> ModelConnection:
     encoding = load_harmony_encoding(HarmonyEncodingName.HARMONY_GPT_OSS)
+    # encode(..., allowed_special="all") rebuilds the special-token set on
+    # every call; resolve it once and pass the frozen set (with an empty
+    # disallowed set) so the per-chunk encode skips that work.
+    allowed_special = frozenset(encoding.special_tokens_set)
     model_name = checkpoint
     client = ollama.Client(host="localhost")
+    # One bounded pool drives every session's stream instead of a dedicated
+    # thread per session, capping stack memory and scheduler load when many
+    # sessions are open at once.
+    pool = ThreadPoolExecutor(
+        max_workers=min(32, (os.cpu_count() or 1) * 4),
+        thread_name_prefix="ollama-stream",
+    )
 
     class OlmSession:
         def __init__(self, session_id: str, model_name: str, client):
             self.session_id = session_id
             self.model_name = model_name
             self.client = client
-            self._token_buffer: deque[int] = deque()
+            # Tokens are buffered as int32 array batches (one per producer
+            # flush) instead of boxed Python ints; _head_idx is the read
+            # cursor into the oldest batch.
+            self._token_chunks: deque[array] = deque()
+            self._head_idx = 0
             self._buffer_lock = threading.Lock()
+            # Single-consumer invariant: only one infer_next_token caller waits
+            # on this condition per session, so producers use notify() rather
+            # than notify_all().
             self._token_available = threading.Condition(self._buffer_lock)
-            self._stream_thread: Optional[threading.Thread] = None
+            self._stream_future: Optional[Future] = None
             self._stream_done = threading.Event()
             self._stream_error: Optional[Exception] = None
             self._close_connection = threading.Event()
+            # Decode cache: prompts grow by appending tokens between turns,
+            # so the previous prompt is usually a strict prefix of the next.
+            self._cached_prefix_ids: list[int] = []
+            self._cached_prefix_text = ""
+            # Context tokens returned by Ollama for the last completed
+            # stream, plus the harmony tokens (prompt + emitted completion)
+            # they correspond to; lets continuation turns skip the full
+            # decode-then-re-encode round-trip.
+            self._last_context: Optional[list[int]] = None
+            self._context_prefix_ids: list[int] = []
+            # EWMA of producer arrival gaps, used to size the condition
+            # wait timeout (which only matters when _stream_done is set
+            # without a matching notify). Only pops that actually blocked
+            # feed it; see infer_next_token.
+            self._ewma_gap = 0.02
+            self._last_pop = _now()
 
         def _reset_stream_state(self):
             with self._buffer_lock:
-                self._token_buffer.clear()
-            self._close_connection.clear()
-            self._stream_done.clear()
-            self._stream_thread = None
+                self._token_chunks.clear()
+                self._head_idx = 0
+            # Fresh event: a producer that outlived close() still holds the
+            # old one, so it can never signal completion for the new stream.
+            self._stream_done = threading.Event()
+            self._stream_future = None
             self._stream_error = None
 
         def _start_stream(self, token_ids: list[int], temperature: float):
-            prompt_text = encoding.decode(token_ids)
+            context = None
+            ctx_len = len(self._context_prefix_ids)
+            prefix_len = len(self._cached_prefix_ids)
+            if (
+                self._last_context is not None
+                and 0 < ctx_len <= len(token_ids)
+                and token_ids[:ctx_len] == self._context_prefix_ids
+            ):
+                # Ollama already holds this prefix in its own context
+                # tokens, so only the new suffix needs to be decoded and
+                # sent as prompt text.
+                context = self._last_context
+                prompt_text = encoding.decode(token_ids[ctx_len:])
+            elif (
+                0 < prefix_len <= len(token_ids)
+                and token_ids[:prefix_len] == self._cached_prefix_ids
+            ):
+                prompt_text = self._cached_prefix_text + encoding.decode(
+                    token_ids[prefix_len:]
+                )
+            else:
+                prompt_text = encoding.decode(token_ids)
+            if context is None:
+                self._cached_prefix_ids = list(token_ids)
+                self._cached_prefix_text = prompt_text
+            # Each stream gets its own cancel/done pair, captured by the
+            # closure below: once close() sets `cancel`, anything the old
+            # worker does afterwards touches only its own dead events.
+            cancel = self._close_connection = threading.Event()
+            done = self._stream_done
 
             def run():
-                accum_text = []
-                last_len = 0
-                toks = None
+                # Uncommitted text tail; its final token may still merge with
+                # bytes from future chunks, so it is re-encoded on the next
+                # chunk instead of being pushed to the buffer right away.
+                pending = ""
+                emitted: list[int] = []
+                flushed = 0
                 try:
                     for chunk in self.client.generate(
                         model=self.model_name,
                         prompt=prompt_text,
                         stream=True,
+                        context=context,
                         options={
                             "temperature": temperature,
                             "top_p": 1.0,
@@ -67,41 +144,61 @@ def setup_model(checkpoint: str) -> ModelConnection:
                         },
                         raw=True,
                     ):
-                        if self._close_connection.is_set():
-                            with self._buffer_lock:
-                                self._token_buffer.append(EOS_TOKEN)
-                                self._token_available.notify_all()
+                        if cancel.is_set():
+                            # Cancelled: drop everything on the floor so a
+                            # worker unblocking late can't write into the
+                            # buffer of the stream that replaced it.
                             break
-                        if isinstance(chunk.response, str):
-                            accum_text.append(chunk.response)
+                        if text := chunk.response:
+                            pending += text
                             toks = encoding.encode(
-                                "".join(accum_text), allowed_special="all"
+                                pending,
+                                allowed_special=allowed_special,
+                                disallowed_special=(),
                             )
-                            if toks and len(toks) > last_len:
-                                new_toks = toks[last_len:]
-                                with self._buffer_lock:
-                                    self._token_buffer.extend(new_toks)
-                                    self._token_available.notify_all()
-                                last_len = len(toks)
+                            if len(toks) > 1:
+                                emitted.extend(islice(toks, len(toks) - 1))
+                                pending = encoding.decode(toks[-1:])
                         if chunk.done:
+                            if pending:
+                                emitted.extend(
+                                    encoding.encode(
+                                        pending,
+                                        allowed_special=allowed_special,
+                                        disallowed_special=(),
+                                    )
+                                )
+                                pending = ""
+                            final_context = getattr(chunk, "context", None)
+                            if final_context:
+                                self._last_context = list(final_context)
+                                self._context_prefix_ids = list(token_ids) + emitted
+                        if chunk.done or len(emitted) - flushed >= TOKEN_BATCH:
+                            batch = array("i", islice(emitted, flushed, None))
+                            if chunk.done:
+                                batch.append(EOS_TOKEN)
                             with self._buffer_lock:
-                                self._token_buffer.append(EOS_TOKEN)
-                                self._token_available.notify_all()
-                    self._stream_done.set()
+                                self._token_chunks.append(batch)
+                                self._token_available.notify()
+                            flushed = len(emitted)
+                    done.set()
                 except Exception as e:
-                    self._stream_error = e
-                    self._stream_done.set()
+                    if not cancel.is_set():
+                        self._stream_error = e
+                    done.set()
 
-            t = threading.Thread(
-                target=run, name=f"ollama-stream-{self.session_id}", daemon=True
-            )
-            t.start()
-            self._stream_thread = t
+            self._stream_future = pool.submit(run)
 
         def close(self):
-            while self._stream_thread and not self._stream_done:
+            future = self._stream_future
+            if future is not None:
                 self._close_connection.set()
-                self._stream_thread.join(timeout=0.5)
+                if not future.cancel():
+                    # The worker may be blocked in an HTTP read that only
+                    # ends when Ollama sends the next chunk; the cancel flag
+                    # already makes its late writes no-ops, so one short
+                    # bounded wait is all teardown needs.
+                    futures_wait([future], timeout=0.5)
             self._reset_stream_state()
 
         def infer_next_token(
@@ -113,11 +210,31 @@ def setup_model(checkpoint: str) -> ModelConnection:
             if self._stream_error is not None:
                 raise RuntimeError(f"Ollama stream error: {self._stream_error!r}")
             with self._token_available:
-                while not self._stream_done.is_set() and not self._token_buffer:
-                    self._token_available.wait(timeout=0.1)
-            with self._buffer_lock:
-                if self._token_buffer:
-                    return self._token_buffer.popleft()
+                blocked = False
+                while not self._stream_done.is_set() and not self._token_chunks:
+                    blocked = True
+                    self._token_available.wait(
+                        timeout=max(0.001, min(1.0, 2 * self._ewma_gap))
+                    )
+                if self._token_chunks:
+                    now = _now()
+                    if blocked:
+                        # Only pops that had to wait say anything about the
+                        # producer's arrival rate; draining an already
+                        # flushed batch takes near-zero time and would
+                        # collapse the EWMA (and with it the wait timeout)
+                        # toward the floor.
+                        self._ewma_gap = 0.8 * self._ewma_gap + 0.2 * (
+                            now - self._last_pop
+                        )
+                    self._last_pop = now
+                    head = self._token_chunks[0]
+                    next_tok = head[self._head_idx]
+                    self._head_idx += 1
+                    if self._head_idx == len(head):
+                        self._token_chunks.popleft()
+                        self._head_idx = 0
+                    return next_tok
             return EOS_TOKEN
 
     class OllamaModelConnection(ModelConnection):
@@ -126,12 +243,17 @@ def setup_model(checkpoint: str) -> ModelConnection:
             self._sessions_lock = threading.Lock()
 
         def _get_or_create_session(self, session_id: str) -> OlmSession:
-            with self._sessions_lock:
-                if session_id not in self._sessions:
-                    self._sessions[session_id] = OlmSession(
-                        session_id, model_name, client
-                    )
-                return self._sessions[session_id]
+            # Dict reads are atomic under the GIL, so the per-token hot path
+            # skips the lock entirely; the lock only serializes creation,
+            # with a re-check inside in case another thread won the race.
+            sess = self._sessions.get(session_id)
+            if sess is None:
+                with self._sessions_lock:
+                    sess = self._sessions.get(session_id)
+                    if sess is None:
+                        sess = OlmSession(session_id, model_name, client)
+                        self._sessions[session_id] = sess
+            return sess
 
         def close_session(self, session_id: str):
             with self._sessions_lock:
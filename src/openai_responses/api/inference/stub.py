@@ -1,4 +1,5 @@
 import time
+from collections import deque
 from typing import Callable, Optional
 
 from openai_responses.api.types import ModelConnection
@@ -126,7 +127,7 @@ fake_tokens = [
 #     198,
 # ]
 
-token_queue = fake_tokens.copy()
+token_queue: deque[int] = deque(fake_tokens)
 
 
 def setup_model(_checkpoint: str) -> Callable[[list[int], float], int]:
@@ -137,10 +138,9 @@ def setup_model(_checkpoint: str) -> Callable[[list[int], float], int]:
             new_request: bool = False,
             session_id: Optional[str] = None,
         ) -> int:
-            global token_queue
-            next_tok = token_queue.pop(0)
+            next_tok = token_queue.popleft()
             if len(token_queue) == 0:
-                token_queue = fake_tokens.copy()
+                token_queue.extend(fake_tokens)
             time.sleep(0.1)
             return next_tok
 
@@ -4,6 +4,8 @@ one token at a time to mimic the behavior of the Triton implementation.
 """
 
 import os
+import threading
+from functools import partial
 from typing import Callable, List, Optional
 
 import torch
@@ -34,20 +36,84 @@ def load_model(checkpoint: str):
 def setup_model(checkpoint: str) -> Callable[[List[int], float, bool], int]:
     model = load_model(checkpoint)
 
-    class TransformersConnection(ModelConnection):
-        def infer_next_token(
-            tokens: List[int],
-            temperature: float = DEFAULT_TEMPERATURE,
-            new_request: bool = False,  # kept for interface compatibility; unused here
-            session_id: Optional[str] = None,
-        ) -> int:
-            tokens = torch.tensor([tokens], dtype=torch.int64, device=model.device)
-            output = model.generate(
-                tokens,
-                max_new_tokens=1,
-                do_sample=temperature != 0,
-                temperature=temperature,
+    class _SessionState:
+        """KV cache for one session's in-flight decode."""
+
+        __slots__ = ("past_key_values", "tokens", "lock")
+
+        def __init__(self):
+            self.past_key_values = None
+            self.tokens: List[int] = []
+            self.lock = threading.Lock()
+
+    def _infer_next_token(
+        conn: "TransformersConnection",
+        tokens: List[int],
+        temperature: float = DEFAULT_TEMPERATURE,
+        new_request: bool = False,
+        session_id: Optional[str] = None,
+    ) -> int:
+        # Reuse the KV cache between calls so each decode step only
+        # forwards the tokens appended since the last call; a full
+        # prefill happens once per request instead of once per token.
+        # The cache is keyed by session so interleaved sessions never
+        # decode on top of each other's state, and the cached token list
+        # must be a prefix of the new prompt before it is reused; the
+        # per-session lock serializes calls that reach the same session
+        # from worker threads.
+        state = conn._get_or_create_session(session_id)
+        with state.lock:
+            cached_len = len(state.tokens)
+            if (
+                new_request
+                or state.past_key_values is None
+                or cached_len >= len(tokens)
+                or tokens[:cached_len] != state.tokens
+            ):
+                state.past_key_values = None
+                cached_len = 0
+            input_ids = torch.tensor(
+                [tokens[cached_len:]], dtype=torch.int64, device=model.device
             )
-            return output[0, -1].tolist()
+            with torch.no_grad():
+                output = model(
+                    input_ids,
+                    past_key_values=state.past_key_values,
+                    use_cache=True,
+                )
+            state.past_key_values = output.past_key_values
+            state.tokens = list(tokens)
+            logits = output.logits[0, -1, :]
+        if temperature == 0:
+            return torch.argmax(logits).item()
+        probs = torch.softmax(logits / temperature, dim=-1)
+        return torch.multinomial(probs, num_samples=1).item()
+
+    class TransformersConnection(ModelConnection):
+        def __init__(self):
+            self._sessions: dict[Optional[str], _SessionState] = {}
+            self._sessions_lock = threading.Lock()
+            # Bound once: looking up a partial in the instance dict skips the
+            # descriptor/bound-method machinery on every token.
+            self.infer_next_token = partial(_infer_next_token, self)
+
+        def _get_or_create_session(self, session_id: Optional[str]) -> _SessionState:
+            # Dict reads are atomic under the GIL, so the per-token hot path
+            # skips the lock; the lock only serializes creation.
+            state = self._sessions.get(session_id)
+            if state is None:
+                with self._sessions_lock:
+                    state = self._sessions.get(session_id)
+                    if state is None:
+                        state = _SessionState()
+                        self._sessions[session_id] = state
+            return state
+
+        def close(self, session_id: Optional[str] = None):
+            with self._sessions_lock:
+                if session_id is not None:
+                    self._sessions.pop(session_id, None)
+                else:
+                    self._sessions.clear()
 
     return TransformersConnection()
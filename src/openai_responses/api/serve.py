@@ -1,6 +1,7 @@
 import argparse
 import logging
 import os
+import platform
 
 import uvicorn
 
@@ -35,7 +36,7 @@ def main():
         type=str,
         help="Inference backend to use",
         # default to metal on macOS, triton on other platforms
-        default="metal" if __import__("platform").system() == "Darwin" else "triton",
+        default="metal" if platform.system() == "Darwin" else "triton",
     )
     parser.add_argument(
         "--search-backend",
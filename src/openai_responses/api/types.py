@@ -1,5 +1,5 @@
 from types import SimpleNamespace
-from typing import Any, Dict, Literal, Optional, Union
+from typing import Any, Dict, Literal, Optional, Protocol, Union
 
 from openai_harmony import ReasoningEffort
 from pydantic import BaseModel
@@ -10,6 +10,26 @@ REASONING_EFFORT = ReasoningEffort.MEDIUM
 DEFAULT_MAX_OUTPUT_TOKENS = 10_000
 
 
+class EncodingProtocol(Protocol):
+    """The subset of :class:`openai_harmony.HarmonyEncoding` the API server
+    uses; anything duck-typed to this (e.g. a test stub) is accepted.
+    """
+
+    def encode(self, text: str, *, allowed_special: Any = ...) -> list[int]: ...
+
+    def decode_utf8(self, tokens: list[int]) -> str: ...
+
+    def parse_messages_from_completion_tokens(
+        self, tokens: list[int], role: Any
+    ) -> list[Any]: ...
+
+    def render_conversation_for_completion(
+        self, conversation: Any, role: Any
+    ) -> list[int]: ...
+
+    def stop_tokens_for_assistant_actions(self) -> list[int]: ...
+
+
 class ModelConnection(SimpleNamespace):
     def infer_next_token(
         self,
@@ -1,11 +1,17 @@
-from .backend import (
-    DDGSBackend,
-    ExaBackend,
-    OllamaBackend,
-    TavilyBackend,
-    YouComBackend,
-)
-from .simple_web_search_tool import SimpleWebSearchTool
+import importlib
+
+# All public names resolve lazily (PEP 562): the tool module and the backend
+# module it pulls in load the whole search client stack (ddgs, aiohttp,
+# tenacity, tiktoken, ...), so importing this package stays free until one of
+# these names is actually referenced.
+_LAZY_ATTRS = {
+    "DDGSBackend": "backend",
+    "ExaBackend": "backend",
+    "OllamaBackend": "backend",
+    "SimpleWebSearchTool": "simple_web_search_tool",
+    "TavilyBackend": "backend",
+    "YouComBackend": "backend",
+}
 
 __all__ = [
     "DDGSBackend",
@@ -15,3 +21,16 @@ __all__ = [
     "TavilyBackend",
     "YouComBackend",
 ]
+
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRS:
+        module = importlib.import_module(f".{_LAZY_ATTRS[name]}", __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted(__all__)
@@ -0,0 +1,18 @@
+"""Shared fixtures for the test suite."""
+
+from __future__ import annotations
+
+import pytest
+from openai_harmony import HarmonyEncoding, HarmonyEncodingName, load_harmony_encoding
+
+
+@pytest.fixture(scope="session")
+def harmony_encoder() -> HarmonyEncoding:
+    """The real Harmony tokenizer, loaded once per test session.
+
+    Loading pulls the vocabulary tables into Rust state, which is far too
+    slow to repeat per stub instantiation; every ``DummyEncoding`` in the
+    suite delegates to this single instance.
+    """
+
+    return load_harmony_encoding(HarmonyEncodingName.HARMONY_GPT_OSS)
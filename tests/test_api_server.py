@@ -18,26 +18,31 @@ The tests cover the following paths:
   verifies that an error is attached to the response.
 * Debug mode rendering – ensures debug payload is included.
 
-Each test uses :class:`fastapi.testclient.TestClient` to hit the
-``/v1/responses`` endpoint, which internally uses the mocked
-``generate_response`` logic.
+The FastAPI app and :class:`fastapi.testclient.TestClient` are built
+once per session; each test swaps in a fresh ``DummyEncoding`` through
+the server's ``set_encoding`` hook before hitting ``/v1/responses``.
 """
 
 from __future__ import annotations
 
+from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional
 
+import orjson
+import pytest
 from fastapi.testclient import TestClient
-from openai_harmony import HarmonyEncoding, HarmonyEncodingName, load_harmony_encoding
+from openai_harmony import HarmonyEncoding
 
 from openai_responses.api.api_server import create_api_server
 from openai_responses.api.types import ModelConnection
+from openai_responses.tools.simple_web_search import SimpleWebSearchTool
 
 # ---------------------------------------------------------------------------
 # Helper data structures -----------------------------------------------------
 # ---------------------------------------------------------------------------
 
 
+@dataclass(slots=True, frozen=True)
 class DummyMessage:
     """Represents the minimal interface required by the server.
 
@@ -47,46 +52,66 @@ class DummyMessage:
     original implementation.
     """
 
-    def __init__(self, recipient: str, channel: str, content: List[Dict[str, Any]]):
-        self._data: Dict[str, Any] = {
-            "recipient": recipient,
-            "channel": channel,
-            "content": content,
-        }
+    recipient: str
+    channel: str
+    content: List[Dict[str, Any]]
+    _as_dict: Dict[str, Any] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        # cached_property needs __dict__, which slots removes; build the
+        # dict once up front instead (object.__setattr__ sidesteps frozen).
+        object.__setattr__(
+            self,
+            "_as_dict",
+            {
+                "recipient": self.recipient,
+                "channel": self.channel,
+                "content": self.content,
+            },
+        )
 
     def to_dict(self) -> Dict[str, Any]:
-        return self._data
+        return self._as_dict
 
 
-class DummyEncoding(HarmonyEncoding):
-    """Mock of :class:`HarmonyEncoding`.
+class DummyEncoding:
+    """Duck-typed stand-in for :class:`HarmonyEncoding`.
 
-    Only the methods used by the tests are implemented.  They are
-    intentionally simple: ``decode_utf8`` just joins the token
-    integer list into a string of their ``chr`` values, while
-    ``parse_messages_from_completion_tokens`` simply returns the
-    pre‑configured list of :class:`DummyMessage` objects.
+    The server only needs the ``EncodingProtocol`` surface, so no real
+    subclassing (and none of the Rust-side construction it entails) is
+    required.  Each test gets a fresh instance and the scenario is
+    injected through the mutable ``messages`` list and ``raise_for`` flag
+    rather than the constructor.  Methods not overridden here (e.g.
+    ``render_conversation_for_completion``) fall through to the shared
+    real encoder via ``__getattr__``; that encoder comes from the
+    session-scoped ``harmony_encoder`` fixture.
     """
 
-    def __init__(
-        self, messages: List[DummyMessage] | None = None, raise_for: bool = False
-    ):
-        self._messages = messages or []
-        self._raise_for = raise_for
-        self._encoder = load_harmony_encoding(HarmonyEncodingName.HARMONY_GPT_OSS)
-        self._inner = self._encoder._inner
+    def __init__(self, encoder: HarmonyEncoding):
+        self.messages: List[DummyMessage] = []
+        self.raise_for = False
+        self._encoder = encoder
+        # StreamableParser reaches for the Rust-side handle directly.
+        self._inner = encoder._inner
+
+    def __getattr__(self, name: str):
+        return getattr(self._encoder, name)
 
     # The tests trigger this method with a deterministic list of
     # ``input_tokens``/``output_tokens``.  In normal operation the
     # behaviour is irrelevant as we have already set what the
     # server should parse.
-    def parse_messages_from_completion_tokens(self, tokens: List[int], role):  # type: ignore[override]
-        if self._raise_for:
+    def parse_messages_from_completion_tokens(self, tokens: List[int], role):
+        if self.raise_for:
             raise RuntimeError("Simulated parsing failure")
-        return self._messages
+        return self.messages
 
-    def decode_utf8(self, tokens: List[int]):  # type: ignore[override]
-        return "".join(self._encoder.decode_utf8([t]) for t in tokens if t)
+    def decode_utf8(self, tokens: List[int]):
+        # One FFI call for the whole batch; zero tokens are skipped just as
+        # the old per-token loop did.
+        if not any(tokens):
+            return ""
+        return self._encoder.decode_utf8([t for t in tokens if t])
 
     def encode(
         self, text: str, *, allowed_special="all"
@@ -106,39 +131,50 @@ class DummyModelConnection(ModelConnection):
         pass
 
 
-def client_for_messages(messages: List[DummyMessage], raise_parse: bool = False):
-    """Return a :class:`TestClient` configured to return ``messages``.
+@pytest.fixture(scope="session")
+def _session_client(harmony_encoder):
+    """Build the FastAPI app and ``TestClient`` once for the session."""
+
+    encoding = DummyEncoding(harmony_encoder)
+    app = create_api_server(model_connection=DummyModelConnection(), encoding=encoding)
+    with TestClient(app) as client:
+        yield client, encoding
 
-    ``raise_parse`` forces ``parse_messages_from_completion_tokens``
-    to raise an exception for debugging‑mode error handling tests.
+
+@pytest.fixture
+def shared_client(_session_client, harmony_encoder):
+    """Per-test view of the session client with a fresh encoding.
+
+    Swapping a new ``DummyEncoding`` in through the server's
+    ``set_encoding`` hook both isolates the tests from each other and
+    exercises the hook itself; the session encoding is restored on
+    teardown.
     """
 
-    encoding = DummyEncoding(messages, raise_for=raise_parse)
-    model = DummyModelConnection()
-    app = create_api_server(model_connection=model, encoding=encoding)
-    return TestClient(app)
+    client, base_encoding = _session_client
+    encoding = DummyEncoding(harmony_encoder)
+    client.app.state.set_encoding(encoding)
+    yield client, encoding
+    client.app.state.set_encoding(base_encoding)
 
 
 # ---------------------------------------------------------------------------
-# Test cases
+# Request bodies -------------------------------------------------------------
 # ---------------------------------------------------------------------------
 
+# Serialized once at import; TestClient would otherwise re-encode the same
+# dicts on every request.
+_JSON_HEADERS = {"content-type": "application/json"}
 
-def test_final_output_returns_text_content():
-    """A response that contains only plain assistant text.
 
-    The server should return an ``Item`` with a single
-    :class:`TextContentItem`.
-    """
+def _json(resp) -> Dict[str, Any]:
+    """Decode a response body with orjson instead of httpx's stdlib json."""
+
+    return orjson.loads(resp.content)
 
-    final_msg = DummyMessage(
-        recipient="assistant",
-        channel="final",
-        content=[{"text": "Hello world!"}],
-    )
-    client = client_for_messages([final_msg])
 
-    body = {
+_BODY_FINAL = orjson.dumps(
+    {
         "input": [
             {
                 "type": "message",
@@ -152,30 +188,10 @@ def test_final_output_returns_text_content():
         "stream": False,
         "previous_response_id": None,
     }
-    resp = client.post("/v1/responses", json=body)
-    assert resp.status_code == 200
-    data = resp.json()
-    output = data.get("output", [])
-    assert len(output) == 1
-    item = output[0]
-    assert item["type"] == "message"
-    content = item["content"]
-    assert isinstance(content, list)
-    assert content[0]["type"] == "output_text"
-    assert content[0]["text"] == "Hello world!"
-
-
-def test_function_call_output():
-    """Function calls should be translated into a ``FunctionCallItem``."""
+)
 
-    fc_msg = DummyMessage(
-        recipient="functions.add",  # simulated tool prefix
-        channel="analysis",
-        content=[{"text": '{"a":1, "b":2}'}],
-    )
-    client = client_for_messages([fc_msg])
-
-    body = {
+_BODY_FUNCTION_CALL = orjson.dumps(
+    {
         "input": [
             {
                 "type": "message",
@@ -191,124 +207,182 @@ def test_function_call_output():
             {"type": "function", "name": "add", "parameters": {}, "description": ""}
         ],
     }
-    resp = client.post("/v1/responses", json=body)
-    assert resp.status_code == 200
-    data = resp.json()
-    output = data.get("output", [])
-    assert len(output) == 1
-    fc = output[0]
-    assert fc["type"] == "function_call"
-    assert fc["name"] == "add"
-    assert fc["arguments"] == '{"a":1, "b":2}'
+)
 
+_BODY_WEB_SEARCH = orjson.dumps(
+    {
+        "input": [
+            {
+                "type": "message",
+                "role": "user",
+                "content": [{"type": "text", "text": "Search"}],
+                "status": None,
+            }
+        ],
+        "tools": [
+            {"type": "web_search"},
+        ],
+        "reasoning": {"effort": "medium"},
+        "model": "gpt-oss-120b",
+        "stream": False,
+    }
+)
 
-def test_web_search_call_and_citations():
-    """Verify the code path for a web‑search tool call.
+_BODY_DEBUG = orjson.dumps(
+    {
+        "input": [],
+        "reasoning": {"effort": "medium"},
+        "model": "gpt-oss-120b",
+        "stream": False,
+        "metadata": {"__debug": True},
+    }
+)
 
-    The test uses a mocked :class:`SimpleWebSearchTool` that
-    pretends to parse arguments and normalise citations.
-    """
 
-    # Prepare a message that triggers a web_search tool.
-    web_msg = DummyMessage(
-        recipient="web_search.search",
-        channel="analysis",
-        content=[{"text": '{"query":"python"}'}],
-    )
-    final_msg = DummyMessage(
-        recipient="",
-        channel="final",
-        content=[{"text": "Result is X"}],
-    )
-    client = client_for_messages([web_msg, final_msg])
+# ---------------------------------------------------------------------------
+# Test cases
+# ---------------------------------------------------------------------------
 
-    # Patch the SimpleWebSearchTool used by the server.
-    from openai_responses.tools.simple_web_search import simple_web_search_tool
 
-    orig_tool = simple_web_search_tool.SimpleWebSearchTool
+class _StubWebSearchTool(SimpleWebSearchTool):
+    """Mocked tool that pretends to parse arguments and normalise citations."""
 
-    class TestTool(orig_tool):
-        def process_arguments(self, msg):  # pragma: no cover - trivial
-            return {"query": "python"}
+    def process_arguments(self, msg):  # pragma: no cover - trivial
+        return {"query": "python"}
 
-        def normalize_citations(self, text):  # pragma: no cover - trivial
-            return text, [], False
+    def normalize_citations(self, text):  # pragma: no cover - trivial
+        return text, [], False
 
-    simple_web_search_tool.SimpleWebSearchTool = TestTool
-    try:
-        body = {
-            "input": [
-                {
-                    "type": "message",
-                    "role": "user",
-                    "content": [{"type": "text", "text": "Search"}],
-                    "status": None,
-                }
-            ],
-            "tools": [
-                {"type": "web_search"},
-            ],
-            "reasoning": {"effort": "medium"},
-            "model": "gpt-oss-120b",
-            "stream": False,
-        }
-        resp = client.post("/v1/responses", json=body)
-        assert resp.status_code == 200
-        data = resp.json()
-        output = data["output"]
-        # Search call item should appear followed by the final message
-        assert any(item["type"] == "web_search_call" for item in output)
-        # Final message should have text
-        assert any(item["type"] == "message" for item in output)
-    finally:
-        simple_web_search_tool.SimpleWebSearchTool = orig_tool
 
+def _expect_final_text(data):
+    """A response with only plain assistant text yields an ``Item`` with a
+    single ``TextContentItem``."""
 
-def test_parse_error_sets_error_and_returns_debug_tokens(monkeypatch):
-    """When token parsing fails in debug mode an error object is placed on the response.
+    output = data.get("output", [])
+    assert len(output) == 1
+    item = output[0]
+    assert item["type"] == "message"
+    content = item["content"]
+    assert isinstance(content, list)
+    assert content[0]["type"] == "output_text"
+    assert content[0]["text"] == "Hello world!"
 
-    The error message must contain the exception raised by parsing.
-    """
 
-    # The server will call ``generate_response`` with debug_mode=True.
-    client = client_for_messages([], raise_parse=True)
+def _expect_function_call(data):
+    """Function calls are translated into a ``FunctionCallItem``."""
+
+    output = data.get("output", [])
+    assert len(output) == 1
+    fc = output[0]
+    assert fc["type"] == "function_call"
+    assert fc["name"] == "add"
+    assert fc["arguments"] == '{"a":1, "b":2}'
+
+
+def _expect_web_search_call(data):
+    """A web-search tool call produces the search call item followed by the
+    final message."""
+
+    output = data["output"]
+    assert any(item["type"] == "web_search_call" for item in output)
+    assert any(item["type"] == "message" for item in output)
+
+
+def _expect_parse_error(data):
+    """A parsing failure in debug mode attaches an error to the response."""
 
-    body = {
-        "input": [],
-        "reasoning": {"effort": "medium"},
-        "model": "gpt-oss-120b",
-        "stream": False,
-        "metadata": {"__debug": True},
-    }
-    resp = client.post("/v1/responses", json=body)
-    assert resp.status_code == 200
-    data = resp.json()
     assert data["error"] is not None
     assert data["error"]["code"] == "invalid_function_call"
     assert "Simulated parsing failure" in data["error"]["message"]
-    # Debug information should be present
     assert "__debug" in data.get("metadata", {})
 
 
-def test_debug_mode_includes_payload(monkeypatch):
-    """Debug mode should attach decoded token strings to the response metadata."""
-
-    # Simple final message
-    final_msg = DummyMessage(recipient="", channel="final", content=[{"text": "hi"}])
-    client = client_for_messages([final_msg])
+def _expect_debug_payload(data):
+    """Debug mode attaches decoded token strings to the response metadata."""
 
-    body = {
-        "input": [],
-        "reasoning": {"effort": "medium"},
-        "model": "gpt-oss-120b",
-        "stream": False,
-        "metadata": {"__debug": True},
-    }
-    resp = client.post("/v1/responses", json=body)
-    assert resp.status_code == 200
-    data = resp.json()
     meta = data.get("metadata", {})
-    print(meta)
     assert "__debug_input" in meta
     assert "__debug_output" in meta
-    assert meta["__debug"] is not None
+    assert meta.get("__debug") is not None, meta
+
+
+@pytest.mark.parametrize(
+    ("messages", "raise_parse", "use_stub_tool", "body", "check"),
+    [
+        pytest.param(
+            [DummyMessage("assistant", "final", [{"text": "Hello world!"}])],
+            False,
+            False,
+            _BODY_FINAL,
+            _expect_final_text,
+            id="final_text",
+        ),
+        pytest.param(
+            [
+                # "functions." is the simulated tool prefix
+                DummyMessage("functions.add", "analysis", [{"text": '{"a":1, "b":2}'}])
+            ],
+            False,
+            False,
+            _BODY_FUNCTION_CALL,
+            _expect_function_call,
+            id="function_call",
+        ),
+        pytest.param(
+            [
+                DummyMessage(
+                    "web_search.web_search",
+                    "analysis",
+                    [{"text": '{"query":"python"}'}],
+                ),
+                DummyMessage("", "final", [{"text": "Result is X"}]),
+            ],
+            False,
+            True,
+            _BODY_WEB_SEARCH,
+            _expect_web_search_call,
+            id="web_search_call",
+        ),
+        pytest.param(
+            [],
+            True,
+            False,
+            _BODY_DEBUG,
+            _expect_parse_error,
+            id="parse_error_debug",
+        ),
+        pytest.param(
+            [DummyMessage("", "final", [{"text": "hi"}])],
+            False,
+            False,
+            _BODY_DEBUG,
+            _expect_debug_payload,
+            id="debug_payload",
+        ),
+    ],
+)
+def test_responses_endpoint(
+    shared_client, messages, raise_parse, use_stub_tool, body, check
+):
+    """Single matrix over the /v1/responses scenarios.
+
+    The five cases share the session client and differ only in the parsed
+    messages injected into the encoding, the request body, and the
+    assertions run over the JSON payload.
+    """
+
+    client, encoding = shared_client
+    encoding.messages = list(messages)
+    encoding.raise_for = raise_parse
+
+    # Swap the tool class through the server's own hook instead of patching
+    # module globals.
+    orig_tool = client.app.state.web_search_tool_cls
+    if use_stub_tool:
+        client.app.state.set_web_tool_cls(_StubWebSearchTool)
+    try:
+        resp = client.post("/v1/responses", content=body, headers=_JSON_HEADERS)
+        assert resp.status_code == 200
+        check(_json(resp))
+    finally:
+        client.app.state.set_web_tool_cls(orig_tool)
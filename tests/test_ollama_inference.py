@@ -13,26 +13,37 @@ encoding used by :mod:`openai_harmony`.
 from __future__ import annotations
 
 from types import SimpleNamespace
-from typing import Iterator
+from typing import Iterable
 
 import pytest
-from openai_harmony import HarmonyEncoding, HarmonyEncodingName, load_harmony_encoding
+from openai_harmony import HarmonyEncoding
 
 from openai_responses.api.inference import ollama as ollama_mod
 
 # Helper mocks ---------------------------------------------------------------
 
 
-class DummyEncoding(HarmonyEncoding):
-    """Very small stub of an encoding that simply maps characters to
-    integer token ids using their ordinal value.
-    """
+class DummyEncoding:
+    """Very small duck-typed stub of :class:`HarmonyEncoding`.
 
-    def __init__(self):
-        self._encoder = load_harmony_encoding(HarmonyEncodingName.HARMONY_GPT_OSS)
-        self._inner = self._encoder._inner
+    The ollama backend only touches ``encode``, ``decode`` and
+    ``special_tokens_set``, so there is no need to subclass the real
+    Rust-backed class and pay its construction machinery per test.  The
+    real encoder comes in via the session-scoped ``harmony_encoder``
+    fixture.
+    """
 
-    def encode(self, text: str, *, allowed_special: str | None = None):  # type: ignore[override]
+    def __init__(self, encoder: HarmonyEncoding):
+        self._encoder = encoder
+        self.special_tokens_set = encoder.special_tokens_set
+
+    def encode(
+        self,
+        text: str,
+        *,
+        allowed_special=None,
+        disallowed_special="all",
+    ):
         return self._encoder.encode(text)
 
     def decode(self, ids: list[int]):  # pragma: no cover - trivial
@@ -53,70 +64,81 @@ class DummyChunk:
 class DummyClient:
     """Mock of :class:`ollama.Client`.
 
-    The :py:meth:`generate` method yields a fixed sequence of chunks defined by
-    the ``chunk_seq`` attribute. The attribute is consumed each time ``generate``
-    is called.
+    ``generate`` yields the chunks held in ``chunks``.  A list is frozen
+    into a tuple so it can be replayed cheaply; generator inputs (used by
+    the lifetime and error tests) are kept as-is and consumed lazily.
     """
 
-    def __init__(self, chunk_seq: Iterator[DummyChunk]):
-        self.chunk_seq = chunk_seq
+    def __init__(self, chunks: Iterable[DummyChunk]):
+        self.chunks = tuple(chunks) if isinstance(chunks, (list, tuple)) else chunks
 
     def generate(self, *_, **kwargs):  # pragma: no cover - interface only
-        return self.chunk_seq
+        yield from self.chunks
+
 
+# Client the patched ollama.Client factory hands out; each test installs
+# its own through _setup_model_with_mocks.
+_current_client: DummyClient | None = None
 
-def _setup_model_with_mocks(chunk_seq: Iterator[DummyChunk]):
-    """Convenience wrapper to patch the environment and call
-    :func:`ollama_mod.setup_model`.
+
+@pytest.fixture(autouse=True)
+def _patch_ollama(monkeypatch, harmony_encoder):
+    """Patch the backend module once per test via the fixture-managed
+    monkeypatch rather than a fresh ``MonkeyPatch`` context per helper call.
     """
 
-    def fake_load_harmony_encoding(name):  # pragma: no cover - trivial
-        return DummyEncoding()
+    monkeypatch.setattr(
+        ollama_mod,
+        "load_harmony_encoding",
+        lambda name: DummyEncoding(harmony_encoder),
+    )
+    monkeypatch.setattr(
+        ollama_mod, "ollama", SimpleNamespace(Client=lambda **kwargs: _current_client)
+    )
+
 
-    def fake_client_factory(**kwargs):  # pragma: no cover - trivial
-        return DummyClient(chunk_seq)
+def _setup_model_with_mocks(chunks: Iterable[DummyChunk]):
+    """Install a :class:`DummyClient` for ``chunks`` and build the model."""
 
-    with pytest.MonkeyPatch().context() as mp:
-        mp.setattr(ollama_mod, "load_harmony_encoding", fake_load_harmony_encoding)
-        mp.setattr(ollama_mod, "ollama", SimpleNamespace(Client=fake_client_factory))
-        return ollama_mod.setup_model("dummy_checkpoint")
+    global _current_client
+    _current_client = DummyClient(chunks)
+    return ollama_mod.setup_model("dummy_checkpoint")
 
 
 # Tests ---------------------------------------------------------------------
 
 
-def test_infer_sequence_of_tokens_and_eos(tmp_path, monkeypatch):
+def test_infer_sequence_of_tokens_and_eos(tmp_path, harmony_encoder):
     # Sequence: "Hi", then " there", then done.
-    chunks = iter(
-        [
-            DummyChunk("Hi", False),
-            DummyChunk(" there", False),
-            DummyChunk("", True),
-        ]
-    )
+    chunks = [
+        DummyChunk("Hi", False),
+        DummyChunk(" there", False),
+        DummyChunk("", True),
+    ]
     conn = _setup_model_with_mocks(chunks)
     session_id = "testsid"
-    token1 = conn.infer_next_token(
+    # Drain the whole stream and compare against a single batch encode of
+    # the concatenated text; this pins the chunk-batched tokenization
+    # without hard-coding individual token ids.
+    produced: list[int] = []
+    token = conn.infer_next_token(
         [], temperature=0.0, new_request=True, session_id=session_id
     )
-    token2 = conn.infer_next_token(
-        [], temperature=0.0, new_request=False, session_id=session_id
-    )
-    assert token1 == 12194
-    assert token2 == 1354
-    eos = conn.infer_next_token(
-        [], temperature=0.0, new_request=False, session_id=session_id
-    )
-    assert eos == ollama_mod.EOS_TOKEN
+    while token != ollama_mod.EOS_TOKEN:
+        produced.append(token)
+        token = conn.infer_next_token(
+            [], temperature=0.0, new_request=False, session_id=session_id
+        )
+    assert produced == harmony_encoder.encode("Hi there")
 
 
-def test_stream_lifetime_and_close(tmp_path, monkeypatch):
+def test_stream_lifetime_and_close(tmp_path):
     def never_yield():
         for _ in range(100):
             # Never set done=True
             yield DummyChunk("", False)
 
-    conn = _setup_model_with_mocks(iter(never_yield()))
+    conn = _setup_model_with_mocks(never_yield())
     session_id = "mytest"
     conn.infer_next_token([], new_request=True, session_id=session_id)
     # Close call should return EOS_TOKEN
@@ -125,13 +147,13 @@ def test_stream_lifetime_and_close(tmp_path, monkeypatch):
     assert tok == ollama_mod.EOS_TOKEN
 
 
-def test_error_handling_on_generate_exception(tmp_path, monkeypatch):
+def test_error_handling_on_generate_exception(tmp_path):
     def raise_error():  # pragma: no cover
         for i in range(1):
             if i == 0:
                 raise RuntimeError("boom")
             yield DummyChunk(chr(i), False)
 
-    conn = _setup_model_with_mocks(iter(raise_error()))
+    conn = _setup_model_with_mocks(raise_error())
     with pytest.raises(RuntimeError, match="boom"):
         conn.infer_next_token([], new_request=True, session_id="sid")